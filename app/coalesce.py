@@ -0,0 +1,148 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+
+#############################
+#       CONFIGURATION       #
+#############################
+load_dotenv()
+# how long (ms) a request waits on an identical in-flight read before
+# running its own query. 0 turns coalescing off
+COALESCE_WINDOW_MS = int(os.getenv("COALESCE_WINDOW_MS", "5000"))
+
+
+class _Call:
+  # one in-flight execution shared by the leader and its followers
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+#############################
+#       SINGLE FLIGHT       #
+#############################
+class SingleFlight:
+  """
+  Coalesces identical concurrent reads: the first caller for a key runs the
+  function, callers that arrive while it is running wait and get the same
+  result. The key is dropped as soon as the call finishes, so a result is
+  never handed out after its query is done (this is not a cache).
+  """
+
+  def __init__(self, window_ms: int = COALESCE_WINDOW_MS):
+    self.window_ms = window_ms
+    self._lock = threading.Lock()
+    self._calls = {}
+    self._paused = 0
+    self._stats = {"executed": 0, "coalesced": 0, "timed_out": 0}
+
+  def do(self, key, fn):
+    """
+    runs fn once for all concurrent callers sharing key
+
+    Args:
+        key (tuple): route name + normalized parameters
+        fn (callable): zero-argument function doing the read
+
+    Returns:
+        whatever fn returns, shared by every coalesced caller
+    """
+    if self.window_ms <= 0:
+      return fn()
+
+    with self._lock:
+      # bulk writes in progress: every read runs its own query
+      if self._paused:
+        call, leader = None, False
+      else:
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+          call = _Call()
+          self._calls[key] = call
+
+    if call is None:
+      return fn()
+
+    if not leader:
+      if call.done.wait(self.window_ms / 1000):
+        with self._lock:
+          self._stats["coalesced"] += 1
+        if call.error is not None:
+          raise call.error
+        return call.result
+      # leader is too slow, don't hold this request any longer
+      with self._lock:
+        self._stats["timed_out"] += 1
+      return fn()
+
+    try:
+      call.result = fn()
+    except Exception as exc:
+      call.error = exc
+      raise
+    finally:
+      with self._lock:
+        # a write may have detached this call and a newer one taken the key
+        if self._calls.get(key) is call:
+          del self._calls[key]
+        self._stats["executed"] += 1
+      call.done.set()
+    return call.result
+
+  def forget(self, match):
+    """
+    detaches in-flight calls whose key satisfies match, so callers arriving
+    after a write start a fresh query. callers already waiting still get
+    the running result, which began before the write
+
+    Args:
+        match (callable): key -> bool
+    """
+    with self._lock:
+      for key in [key for key in self._calls if match(key)]:
+        del self._calls[key]
+
+  def pause(self):
+    """
+    stops coalescing until a matching resume(), for writes that commit in
+    stages (bulk jobs) where there is no single point to forget keys at
+    """
+    with self._lock:
+      self._paused += 1
+      self._calls.clear()
+
+  def resume(self):
+    with self._lock:
+      self._paused -= 1
+      self._calls.clear()
+
+  def stats(self):
+    """
+    snapshot of the counters plus the number of reads currently in flight
+    """
+    with self._lock:
+      return {
+        **self._stats,
+        "in_flight": len(self._calls),
+        "window_ms": self.window_ms,
+      }
+
+  def reset(self):
+    with self._lock:
+      self._stats = dict.fromkeys(self._stats, 0)
+
+
+# shared by all vehicle read routes
+reads = SingleFlight()
+
+
+def forget_vehicle(vin: str):
+  """
+  called after a committed write to vin: later reads of that vehicle and of
+  any list must not join a query that started before the write
+  """
+  vin = vin.lower()
+  reads.forget(lambda key: key[0] == "get_all_vehicles" or key == ("get_vehicle", vin))
@@ -1,6 +1,35 @@
+from functools import lru_cache
+from itertools import islice
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import models, schemas, sharding
+
+# keeps each IN (...) well under driver bind parameter limits
+LOOKUP_CHUNK_SIZE = 500
+
+
+class _HotStatements(NamedTuple):
+  by_vin: object
+  all_by_manufacturer: object
+  # per-shard lists for _scatter_gather, in the order merge_shards expects
+  all_by_codepoint: object
+
+
+@lru_cache(maxsize=None)
+def _statements(model):
+  """
+  builds the hot path statements once per mapped class. the VIN is a bound
+  parameter, so every call reuses the same statement object (and its
+  compiled form) instead of constructing a new Query
+  """
+  return _HotStatements(
+    by_vin=select(model).where(model.vin == bindparam("vin")).limit(1),
+    all_by_manufacturer=select(model).order_by(model.manufacturer_name),
+    all_by_codepoint=select(model).order_by(sharding.binary_order(model.manufacturer_name)),
+  )
 
 def add_vehicle(db: Session, vehicle_data: schemas.VehicleCreate):
   """
@@ -26,6 +55,18 @@ def add_vehicle(db: Session, vehicle_data: schemas.VehicleCreate):
   db.refresh(new_vehicle) # just in case
   return new_vehicle
 
+def add_vehicles(db: Session, vehicles: list[schemas.VehicleCreate]):
+  """
+  adds many vehicles in a single transaction. nothing is inserted if any
+  of them fails (e.g. a duplicate VIN)
+
+  Args:
+      db (Session): _description_
+      vehicles (list[schemas.VehicleCreate]): _description_
+  """
+  db.add_all([models.Vehicle(**vehicle.model_dump()) for vehicle in vehicles])
+  db.commit()
+
 def get_vehicle(db: Session, vin: str):
   """
   gets one vehicle by vin
@@ -35,27 +76,136 @@ def get_vehicle(db: Session, vin: str):
       vin (str): _description_
   """
   # normalize vin to lowercase since model validator stores it lowercase
-  return (
-    db.query(models.Vehicle)
-      .filter(models.Vehicle.vin == vin.lower())
-      .first()
-  )
+  statement = _statements(models.Vehicle).by_vin
+  return db.execute(
+    statement, {"vin": vin.lower()}, bind_arguments=sharding.route(db, vin)
+  ).scalars().first()
 
-def get_all_vehicles(db: Session):
+def get_all_vehicles(db: Session, fields: tuple[str, ...] | None = None):
   """
   gets all vehicles in the database
 
   Args:
       db (Session): _description_
+      fields (tuple[str, ...] | None): if given, only these columns are
+          selected and rows come back instead of Vehicle objects
 
   Returns:
       _type_: _description_
   """
-  return (
-    db.query(models.Vehicle)
+  if sharding.shard_map_of(db) is not None:
+    return list(_scatter_gather(db, fields))
+
+  if fields:
+    columns = [getattr(models.Vehicle, name) for name in fields]
+    return db.execute(select(*columns).order_by(models.Vehicle.manufacturer_name)).all()
+
+  statement = _statements(models.Vehicle).all_by_manufacturer
+  return db.execute(statement).scalars().all()
+
+def _scatter_gather(db: Session, fields: tuple[str, ...] | None, batch_size: int | None = None):
+  """
+  runs the manufacturer-ordered list on every shard and k-way merges the
+  already sorted per-shard results, so the combined list keeps the order
+
+  Args:
+      db (Session): sharded session
+      fields (tuple[str, ...] | None): columns to select, None for Vehicle objects
+      batch_size (int | None): stream each shard with yield_per if given
+
+  Returns:
+      Iterator: Vehicle objects, or tuples of `fields` when projecting
+  """
+  shard_map = sharding.shard_map_of(db)
+  options = {"yield_per": batch_size} if batch_size else {}
+
+  if fields:
+    # manufacturer_name rides along at the end as the merge key
+    columns = [getattr(models.Vehicle, name) for name in fields]
+    statement = (
+      select(*columns, models.Vehicle.manufacturer_name)
+        .order_by(sharding.binary_order(models.Vehicle.manufacturer_name))
+    )
+    results = [
+      db.execute(statement, bind_arguments={"shard_id": shard_id}, execution_options=options)
+      for shard_id in shard_map.shard_ids
+    ]
+    merged = sharding.merge_shards(results, key=lambda row: row[-1])
+    return (tuple(row[:-1]) for row in merged)
+
+  statement = _statements(models.Vehicle).all_by_codepoint
+  results = [
+    db.execute(statement, bind_arguments={"shard_id": shard_id}, execution_options=options).scalars()
+    for shard_id in shard_map.shard_ids
+  ]
+  return sharding.merge_shards(results, key=lambda vehicle: vehicle.manufacturer_name)
+
+def get_vehicles_by_vins(db: Session, vins: list[str], chunk_size: int = LOOKUP_CHUNK_SIZE):
+  """
+  gets many vehicles by vin using chunked IN queries instead of one
+  SELECT per vin
+
+  Args:
+      db (Session): _description_
+      vins (list[str]): vins to look up, already normalized
+      chunk_size (int): max number of vins bound into a single IN clause
+
+  Returns:
+      tuple[list[models.Vehicle], list[str]]: found vehicles and missing vins,
+      both in the order the vins were requested
+  """
+  # drop duplicates but keep request order
+  wanted = list(dict.fromkeys(vins))
+
+  # group by owning shard so each IN (...) only goes where its vins live
+  shard_map = sharding.shard_map_of(db)
+  groups = {}
+  for vin in wanted:
+    shard_id = shard_map.shard_for(vin) if shard_map else None
+    groups.setdefault(shard_id, []).append(vin)
+
+  found = {}
+  for shard_id, shard_vins in groups.items():
+    bind_arguments = {"shard_id": shard_id} if shard_id else None
+    for start in range(0, len(shard_vins), chunk_size):
+      chunk = shard_vins[start:start + chunk_size]
+      rows = db.execute(
+        select(models.Vehicle).where(models.Vehicle.vin.in_(chunk)),
+        bind_arguments=bind_arguments,
+      ).scalars()
+      for vehicle in rows:
+        found[vehicle.vin] = vehicle
+
+  vehicles = [found[vin] for vin in wanted if vin in found]
+  missing = [vin for vin in wanted if vin not in found]
+  return vehicles, missing
+
+def iter_vehicle_batches(db: Session, fields: tuple[str, ...], batch_size: int):
+  """
+  streams the selected columns of every vehicle, ordered by manufacturer,
+  in batches of rows so large exports don't load the whole table
+
+  Args:
+      db (Session): _description_
+      fields (tuple[str, ...]): column names to select
+      batch_size (int): rows fetched from the cursor per batch
+
+  Yields:
+      list[Row]: up to batch_size rows
+  """
+  if sharding.shard_map_of(db) is not None:
+    rows = _scatter_gather(db, fields, batch_size)
+    while batch := list(islice(rows, batch_size)):
+      yield batch
+    return
+
+  columns = [getattr(models.Vehicle, name) for name in fields]
+  result = db.execute(
+    select(*columns)
       .order_by(models.Vehicle.manufacturer_name)
-      .all()
+      .execution_options(yield_per=batch_size)
   )
+  yield from result.partitions()
 
 def update_vehicle(db: Session, vin: str, vehicle_data: schemas.VehicleUpdate):
   """
@@ -88,6 +238,31 @@ def update_vehicle(db: Session, vin: str, vehicle_data: schemas.VehicleUpdate):
   return vehicle
 
 
+def update_vehicles(db: Session, vehicles: list[schemas.VehicleCreate]):
+  """
+  full replacement of many vehicles, each selected by its vin. rows are
+  loaded with IN queries and written back in a single commit
+
+  Args:
+      db (Session): _description_
+      vehicles (list[schemas.VehicleCreate]): new values, vin picks the row
+
+  Returns:
+      list[str]: vins that were not found (and so not updated)
+  """
+  existing, missing = get_vehicles_by_vins(db, [vehicle.vin for vehicle in vehicles])
+  by_vin = {vehicle.vin: vehicle for vehicle in existing}
+
+  for vehicle_data in vehicles:
+    vehicle = by_vin.get(vehicle_data.vin)
+    if vehicle is None:
+      continue
+    for field, value in vehicle_data.model_dump(exclude={"vin"}).items():
+      setattr(vehicle, field, value)
+
+  db.commit()
+  return missing
+
 def delete_vehicle(db: Session, vin: str):
   """
   removes vehicle associated with vin from database
@@ -96,6 +271,9 @@ def delete_vehicle(db: Session, vin: str):
       db (Session): _description_
       vin (str): _description_
   """
+  # lookup goes through the cached by-vin statement. the row is removed
+  # through the session (not a bulk DELETE) so callers holding the
+  # instance still see it as deleted rather than expired
   vehicle = get_vehicle(db, vin)
   # if there is nothing to delete, return deletion unsuccessful
   if vehicle is None:
@@ -104,9 +282,3 @@ def delete_vehicle(db: Session, vin: str):
   db.delete(vehicle)
   db.commit()
   return True # successfully deleted
-
-
-
-
-
-
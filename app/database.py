@@ -1,8 +1,10 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from app.sharding import ShardMap
+
 
 #############################
 #       DB CONNECTION       #
@@ -10,14 +12,48 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 # temp way to store db password
 load_dotenv()
 CONN_URL = os.getenv("CONN_URL")
+# optional: comma-separated URLs to hash-partition vehicles across by VIN.
+# when set, these replace CONN_URL
+SHARD_URLS = [url.strip() for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
 
-# create connection + session 
-engine = create_engine(
-    CONN_URL,
-    echo=False,
-)
 
-Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _connect_args(url):
+    # psycopg 3 (postgresql+psycopg://) prepares a statement server-side once
+    # it has run PG_PREPARE_THRESHOLD times on a connection. psycopg2 has no
+    # server-side prepare, so nothing is passed for it
+    if make_url(url).drivername == "postgresql+psycopg":
+        return {"prepare_threshold": int(os.getenv("PG_PREPARE_THRESHOLD", "1"))}
+    return {}
+
+
+def make_sessionmaker(**engine_kwargs):
+    """
+    builds the engine(s) + session factory for CONN_URL, or one engine per
+    shard when SHARD_URLS is set. engine_kwargs (e.g. pool sizes) apply to
+    every engine
+
+    Returns:
+        tuple[list[Engine], sessionmaker]
+    """
+    def make_engine(url):
+        return create_engine(
+            url,
+            echo=False,
+            connect_args=_connect_args(url),
+            **engine_kwargs,
+        )
+
+    if SHARD_URLS:
+        shards = ShardMap(SHARD_URLS, make_engine=make_engine)
+        return list(shards.engines.values()), shards.sessionmaker(autocommit=False, autoflush=False)
+
+    engine = make_engine(CONN_URL)
+    return [engine], sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# create connection + session 
+engines, Session = make_sessionmaker()
+engine = engines[0]
 Base = declarative_base()
 
 #############################
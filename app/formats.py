@@ -0,0 +1,149 @@
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+
+import msgpack
+import pyarrow as pa
+
+
+#############################
+#      MEDIA TYPES          #
+#############################
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# rows per Arrow record batch (and per DB fetch while streaming)
+ARROW_BATCH_SIZE = 5000
+
+# file extensions for export job results
+EXTENSIONS = {MSGPACK: "msgpack", ARROW: "arrows"}
+
+# arrow types matching models.Vehicle, purchase_price stays Numeric(12, 2)
+ARROW_TYPES = {
+  "vin": pa.string(),
+  "manufacturer_name": pa.string(),
+  "description": pa.string(),
+  "horse_power": pa.int32(),
+  "model_name": pa.string(),
+  "model_year": pa.int32(),
+  "purchase_price": pa.decimal128(12, 2),
+  "fuel_type": pa.string(),
+}
+
+
+def negotiate(accept: str | None):
+  """
+  picks the response media type from an Accept header. anything we don't
+  speak (or no header at all) falls back to JSON
+
+  Args:
+      accept (str | None): raw Accept header
+
+  Returns:
+      str: one of JSON, MSGPACK, ARROW
+  """
+  if not accept:
+    return JSON
+
+  ranked = []
+  for position, part in enumerate(accept.split(",")):
+    media_type, *params = [p.strip() for p in part.split(";")]
+    quality = 1.0
+    for param in params:
+      if param.startswith("q="):
+        try:
+          quality = float(param[2:])
+        except ValueError:
+          quality = 0.0
+    # highest q wins, ties go to whichever the client listed first
+    ranked.append((-quality, position, media_type.lower()))
+
+  for negative_quality, _, media_type in sorted(ranked):
+    if negative_quality < 0 and media_type in (JSON, MSGPACK, ARROW):
+      return media_type
+  return JSON
+
+
+#############################
+#         MSGPACK           #
+#############################
+def _msgpack_default(value):
+  # msgpack has no decimal type, a string keeps every digit
+  if isinstance(value, Decimal):
+    return str(value)
+  raise TypeError(f"Cannot serialize {type(value).__name__} to msgpack")
+
+
+def to_msgpack(rows, fields: tuple[str, ...]):
+  """
+  packs DB rows into a msgpack array of maps
+
+  Args:
+      rows (list[Row]): rows selected with exactly `fields` as columns
+      fields (tuple[str, ...]): column names, in select order
+  """
+  records = [dict(zip(fields, row)) for row in rows]
+  return msgpack.packb(records, default=_msgpack_default)
+
+
+def write_msgpack_array(out, batches, fields: tuple[str, ...]):
+  """
+  writes batches of DB rows to `out` as one msgpack array of maps, the
+  same shape to_msgpack gives. the array header needs the row count up
+  front, so rows are packed into a spool file first instead of memory
+
+  Args:
+      out (BinaryIO): destination file
+      batches (Iterable[list[Row]]): row batches selected with `fields`
+      fields (tuple[str, ...]): column names, in select order
+  """
+  packer = msgpack.Packer(default=_msgpack_default)
+  count = 0
+  with tempfile.TemporaryFile() as spool:
+    for rows in batches:
+      for row in rows:
+        spool.write(packer.pack(dict(zip(fields, row))))
+      count += len(rows)
+    out.write(packer.pack_array_header(count))
+    spool.seek(0)
+    shutil.copyfileobj(spool, out)
+
+
+#############################
+#       ARROW STREAM        #
+#############################
+def arrow_schema(fields: tuple[str, ...]):
+  return pa.schema([(name, ARROW_TYPES[name]) for name in fields])
+
+
+def iter_arrow_stream(batches, fields: tuple[str, ...]):
+  """
+  encodes batches of DB rows as an Arrow IPC stream, yielding bytes as
+  each record batch is written so the full result never sits in memory
+
+  Args:
+      batches (Iterable[list[Row]]): row batches selected with `fields`
+      fields (tuple[str, ...]): column names, in select order
+  """
+  schema = arrow_schema(fields)
+  sink = io.BytesIO()
+
+  def flush():
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+  with pa.ipc.new_stream(sink, schema) as writer:
+    yield flush()  # schema message
+    for rows in batches:
+      columns = list(zip(*rows)) if rows else [[] for _ in fields]
+      batch = pa.record_batch(
+        [pa.array(column, type=schema.field(i).type) for i, column in enumerate(columns)],
+        schema=schema,
+      )
+      writer.write_batch(batch)
+      yield flush()
+  yield flush()  # end-of-stream marker
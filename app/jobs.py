@@ -0,0 +1,386 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app import crud, formats
+from app.coalesce import reads
+
+
+#############################
+#       CONFIGURATION       #
+#############################
+load_dotenv()
+# "thread" or "process"
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "thread")
+# jobs running at once. jobs get their own pool of exactly this many
+# connections, so they can't starve the /vehicle routes
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# queued + running jobs accepted before new submissions are refused
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# rows per transaction / progress update
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "500"))
+# where export jobs write their result files
+JOB_EXPORT_DIR = os.getenv("JOB_EXPORT_DIR", tempfile.gettempdir())
+
+# finished jobs kept around for GET /jobs/{id}
+JOB_HISTORY_LIMIT = 1000
+# per-row errors kept on a job, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+WRITE_KINDS = ("import", "update")
+
+
+#############################
+#     WORKER SIDE (RUNS)    #
+#############################
+# built lazily in whichever thread pool / process runs jobs, so process
+# workers never reuse connections inherited from the parent. the lock
+# keeps workers starting together from each building their own pool
+_job_session = None
+_job_session_lock = threading.Lock()
+
+
+def _session():
+  global _job_session
+  if _job_session is None:
+    with _job_session_lock:
+      if _job_session is None:
+        from app.database import make_sessionmaker
+        _, _job_session = make_sessionmaker(pool_size=JOB_WORKERS, max_overflow=0)
+  return _job_session()
+
+
+def _now():
+  return datetime.now(timezone.utc)
+
+
+def _batches(items):
+  for start in range(0, len(items), JOB_BATCH_SIZE):
+    yield items[start:start + JOB_BATCH_SIZE]
+
+
+def _advance(progress, processed=0, failed=0, errors=()):
+  # progress may be a Manager proxy in process mode: mutating a nested
+  # value in place wouldn't reach the parent, so every key is reassigned
+  progress["processed"] = progress["processed"] + processed
+  progress["failed"] = progress["failed"] + failed
+  if errors:
+    room = MAX_REPORTED_ERRORS - len(progress["errors"])
+    if room > 0:
+      progress["errors"] = progress["errors"] + list(errors)[:room]
+
+
+def _row_error(vin, exc):
+  if isinstance(exc, IntegrityError):
+    return {"vin": vin, "error": "Vehicle already exists"}
+  # e.g. DataError for a value longer than its column
+  message = str(getattr(exc, "orig", None) or exc).splitlines()[0]
+  return {"vin": vin, "error": message}
+
+
+def _run_import(job_id, vehicles, progress):
+  """
+  Returns:
+      bool: True if every batch ran, False if cancelled part way
+  """
+  db = _session()
+  try:
+    for batch in _batches(vehicles):
+      if progress["cancel_requested"]:
+        return False
+      try:
+        crud.add_vehicles(db, batch)
+        _advance(progress, processed=len(batch))
+        continue
+      except SQLAlchemyError:
+        db.rollback()
+
+      # some row in the batch was rejected, retry row by row to find it
+      errors = []
+      for vehicle in batch:
+        try:
+          crud.add_vehicles(db, [vehicle])
+        except SQLAlchemyError as exc:
+          db.rollback()
+          errors.append(_row_error(vehicle.vin, exc))
+      _advance(progress, processed=len(batch), failed=len(errors), errors=errors)
+    return True
+  finally:
+    db.close()
+
+
+def _run_update(job_id, vehicles, progress):
+  """
+  Returns:
+      bool: True if every batch ran, False if cancelled part way
+  """
+  db = _session()
+  try:
+    for batch in _batches(vehicles):
+      if progress["cancel_requested"]:
+        return False
+      try:
+        missing = crud.update_vehicles(db, batch)
+        errors = [{"vin": vin, "error": "Vehicle not found"} for vin in missing]
+        _advance(progress, processed=len(batch), failed=len(errors), errors=errors)
+        continue
+      except SQLAlchemyError:
+        db.rollback()
+
+      # some row in the batch was rejected, retry row by row to find it
+      errors = []
+      for vehicle in batch:
+        try:
+          if crud.update_vehicles(db, [vehicle]):
+            errors.append({"vin": vehicle.vin, "error": "Vehicle not found"})
+        except SQLAlchemyError as exc:
+          db.rollback()
+          errors.append(_row_error(vehicle.vin, exc))
+      _advance(progress, processed=len(batch), failed=len(errors), errors=errors)
+    return True
+  finally:
+    db.close()
+
+
+def _run_export(job_id, payload, progress):
+  """
+  Returns:
+      bool: True once the file is fully written, False if cancelled before
+  """
+  fields, media_type = payload
+  path = os.path.join(JOB_EXPORT_DIR, f"vehicles-{job_id}.{formats.EXTENSIONS[media_type]}")
+  db = _session()
+  stopped = False
+
+  def counted_batches():
+    nonlocal stopped
+    for rows in crud.iter_vehicle_batches(db, fields, JOB_BATCH_SIZE):
+      if progress["cancel_requested"]:
+        stopped = True
+        return
+      yield rows
+      _advance(progress, processed=len(rows))
+
+  try:
+    with open(path, "wb") as out:
+      if media_type == formats.MSGPACK:
+        formats.write_msgpack_array(out, counted_batches(), fields)
+      else:
+        for chunk in formats.iter_arrow_stream(counted_batches(), fields):
+          out.write(chunk)
+    if stopped:
+      os.remove(path)
+      return False
+    # the file is complete: a cancel arriving from here on is too late
+    progress["result_media_type"] = media_type
+    progress["result_path"] = path
+    return True
+  except Exception:
+    if os.path.exists(path):
+      os.remove(path)
+    raise
+  finally:
+    db.close()
+
+
+def _discard_result(progress):
+  path = progress["result_path"]
+  if path is not None:
+    progress["result_path"] = None
+    if os.path.exists(path):
+      os.remove(path)
+
+
+_RUNNERS = {
+  "import": _run_import,
+  "update": _run_update,
+  "export": _run_export,
+}
+
+
+def run_job(job_id, kind, payload, progress):
+  """
+  entry point in the worker (thread or process). all state goes through
+  `progress` so the API process can report on it
+  """
+  if progress["cancel_requested"]:
+    progress["status"] = CANCELLED
+    progress["finished_at"] = _now()
+    return
+
+  progress["status"] = RUNNING
+  progress["started_at"] = _now()
+  try:
+    completed = _RUNNERS[kind](job_id, payload, progress)
+    progress["status"] = SUCCEEDED if completed else CANCELLED
+  except Exception as exc:
+    progress["status"] = FAILED
+    progress["error"] = str(exc)
+  finally:
+    progress["finished_at"] = _now()
+
+
+#############################
+#     API SIDE (MANAGER)    #
+#############################
+class JobManager:
+  """
+  Bounded pool running long vehicle operations off the request path.
+  Submissions past the queue limit are refused rather than piling up.
+  """
+
+  def __init__(self, executor: str = JOB_EXECUTOR, workers: int = JOB_WORKERS,
+               queue_limit: int = JOB_QUEUE_LIMIT):
+    if executor not in ("thread", "process"):
+      raise ValueError(f"JOB_EXECUTOR must be 'thread' or 'process', not {executor!r}")
+    self.executor = executor
+    self.workers = workers
+    self.queue_limit = queue_limit
+    self._lock = threading.Lock()
+    self._jobs = {}
+    self._pool = None
+    self._manager = None
+
+  def _ensure_pool(self):
+    if self._pool is None:
+      if self.executor == "process":
+        self._manager = multiprocessing.Manager()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+      else:
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="vehicle-job")
+
+  def _new_progress(self, total):
+    initial = {
+      "status": QUEUED,
+      "cancel_requested": False,
+      "total": total,
+      "processed": 0,
+      "failed": 0,
+      "errors": [],
+      "error": None,
+      "result_path": None,
+      "result_media_type": None,
+      "created_at": _now(),
+      "started_at": None,
+      "finished_at": None,
+    }
+    # process workers need a proxy to report back through
+    return self._manager.dict(initial) if self._manager else initial
+
+  def _active(self):
+    return sum(1 for job in self._jobs.values() if job["progress"]["status"] not in FINISHED)
+
+  def _forget_old(self):
+    finished = [job_id for job_id, job in self._jobs.items() if job["progress"]["status"] in FINISHED]
+    for job_id in finished[:max(0, len(self._jobs) - JOB_HISTORY_LIMIT)]:
+      _discard_result(self._jobs.pop(job_id)["progress"])
+
+  def submit(self, kind: str, payload, total: int | None = None):
+    """
+    queues a job
+
+    Args:
+        kind (str): "import", "update" or "export"
+        payload: runner argument (vehicles list, or export (fields, media type))
+        total (int | None): rows expected, if known up front
+
+    Returns:
+        str | None: the job id, or None if the queue is full
+    """
+    with self._lock:
+      if self._active() >= self.queue_limit:
+        return None
+      self._ensure_pool()
+      self._forget_old()
+
+      job_id = uuid.uuid4().hex
+      progress = self._new_progress(total)
+      self._jobs[job_id] = {"kind": kind, "progress": progress, "future": None}
+      future = self._pool.submit(run_job, job_id, kind, payload, progress)
+      if kind in WRITE_KINDS:
+        # batches commit one by one (possibly in another process), so reads
+        # aren't coalesced until the job is done or cancelled
+        reads.pause()
+        future.add_done_callback(lambda _: reads.resume())
+      self._jobs[job_id]["future"] = future
+      return job_id
+
+  def get(self, job_id: str):
+    """
+    snapshot of a job's state, None if there is no such job
+    """
+    with self._lock:
+      job = self._jobs.get(job_id)
+    if job is None:
+      return None
+
+    snapshot = {"id": job_id, "kind": job["kind"], **job["progress"].copy()}
+    snapshot["has_result"] = snapshot.pop("result_path") is not None
+    snapshot.pop("result_media_type")
+
+    started, finished = snapshot["started_at"], snapshot["finished_at"]
+    elapsed = ((finished or _now()) - started).total_seconds() if started else 0
+    snapshot["rows_per_second"] = snapshot["processed"] / elapsed if elapsed > 0 else None
+    return snapshot
+
+  def result(self, job_id: str):
+    """
+    (path, media type) of a finished export, None if there is none
+    """
+    with self._lock:
+      job = self._jobs.get(job_id)
+    if job is None or job["progress"]["result_path"] is None:
+      return None
+    return job["progress"]["result_path"], job["progress"]["result_media_type"]
+
+  def cancel(self, job_id: str):
+    """
+    asks a job to stop. queued jobs never start, running ones stop at the
+    next batch boundary (rows already committed stay committed)
+
+    Returns:
+        dict | None: job snapshot, None if there is no such job
+    """
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job is None:
+        return None
+      progress = job["progress"]
+      if progress["status"] not in FINISHED:
+        progress["cancel_requested"] = True
+        if job["future"].cancel():
+          progress["status"] = CANCELLED
+          progress["finished_at"] = _now()
+    return self.get(job_id)
+
+  def shutdown(self):
+    with self._lock:
+      for job in self._jobs.values():
+        if job["progress"]["status"] not in FINISHED:
+          job["progress"]["cancel_requested"] = True
+      pool, manager = self._pool, self._manager
+      self._pool = self._manager = None
+    if pool is not None:
+      pool.shutdown(wait=True, cancel_futures=True)
+    with self._lock:
+      for job in self._jobs.values():
+        if job["progress"]["status"] == QUEUED:
+          job["progress"]["status"] = CANCELLED
+          job["progress"]["finished_at"] = _now()
+        # export files don't outlive the process that can serve them
+        _discard_result(job["progress"])
+    if manager is not None:
+      manager.shutdown()
+
+
+# shared by the /jobs routes
+jobs = JobManager()
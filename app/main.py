@@ -3,9 +3,10 @@ from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from app.database import engine
+from app.database import engines
 from app import models
-from app.routers import vehicles
+from app.jobs import jobs
+from app.routers import vehicles, stats, jobs as jobs_router
 
 
 @asynccontextmanager
@@ -14,10 +15,15 @@ async def lifespan(app: FastAPI):
     lifespan event handler for startup and shutdown. creates database 
     tables on startup if they don't exist.
     """
-    models.Base.metadata.create_all(bind=engine)
+    # one engine normally, one per shard when SHARD_URLS is set
+    for engine in engines:
+        models.Base.metadata.create_all(bind=engine)
     yield
-    # dispose sqlalchemy engine after we're done using
-    engine.dispose()
+    # stop background jobs before their connections go away
+    jobs.shutdown()
+    # dispose sqlalchemy engines after we're done using
+    for engine in engines:
+        engine.dispose()
 
 
 # initialize the app
@@ -59,5 +65,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         )
 
 
-# include router
-app.include_router(vehicles.router)
\ No newline at end of file
+# include routers
+app.include_router(vehicles.router)
+app.include_router(stats.router)
+app.include_router(jobs_router.router)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.jobs import jobs, SUCCEEDED
+from app.routers.vehicles import parse_fields
+from app import formats, schemas
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+)
+
+
+def _submit(kind, payload, total=None):
+  job_id = jobs.submit(kind, payload, total)
+  if job_id is None:
+    raise HTTPException(
+      status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+      detail="Job queue is full, try again later"
+    )
+  return jobs.get(job_id)
+
+# POST /jobs/import -> 202 Accepted
+@router.post("/import", response_model=schemas.JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def import_vehicles(batch: schemas.VehicleBatch):
+  return _submit("import", batch.vehicles, len(batch.vehicles))
+
+# POST /jobs/update (full replacement of many vehicles) -> 202 Accepted
+@router.post("/update", response_model=schemas.JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def update_vehicles(batch: schemas.VehicleBatch):
+  return _submit("update", batch.vehicles, len(batch.vehicles))
+
+# POST /jobs/export (Arrow stream or msgpack file) -> 202 Accepted
+@router.post("/export", response_model=schemas.JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def export_vehicles(fields: str | None = None, format: Literal["arrow", "msgpack"] = "arrow"):
+  media_type = formats.MSGPACK if format == "msgpack" else formats.ARROW
+  return _submit("export", (parse_fields(fields) or schemas.VEHICLE_FIELDS, media_type))
+
+# GET /jobs/{id} -> 200 OK
+@router.get("/{job_id}", response_model=schemas.JobRead,
+    status_code=status.HTTP_200_OK,
+)
+def get_job(job_id: str):
+  job = jobs.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job
+
+# GET /jobs/{id}/result (export file) -> 200 OK
+@router.get("/{job_id}/result", status_code=status.HTTP_200_OK)
+def get_job_result(job_id: str):
+  job = jobs.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  result = jobs.result(job_id)
+  if job["status"] != SUCCEEDED or result is None:
+    raise HTTPException(status_code=409, detail="Job has no result yet")
+
+  path, media_type = result
+  return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+# DELETE /jobs/{id} (cancel) -> 202 Accepted
+@router.delete("/{job_id}", response_model=schemas.JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def cancel_job(job_id: str):
+  job = jobs.cancel(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, status
+
+from app.coalesce import reads
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["Stats"],
+)
+
+# GET /stats/coalescing -> 200 OK
+@router.get("/coalescing", status_code=status.HTTP_200_OK)
+def get_coalescing_stats():
+  return reads.stats()
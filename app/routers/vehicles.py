@@ -1,30 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
-from app import crud, schemas
+from app.coalesce import reads, forget_vehicle
+from app import crud, formats, schemas
 
 router = APIRouter(
     prefix="/vehicle",
     tags=["Vehicle API"],
 )
 
+# reads are serialized once by whichever request runs the query, and the
+# same JSON bytes go to every request coalesced onto it
+_vehicle_json = TypeAdapter(schemas.VehicleRead)
+_vehicle_list_json = TypeAdapter(list[schemas.VehicleRead])
+_partial_list_json = TypeAdapter(list[schemas.VehiclePartial])
+
+
+def parse_fields(fields: str | None):
+  """
+  turns ?fields=a,b into a tuple of known column names in table order.
+  vin is always included so rows stay identifiable
+  """
+  if fields is None:
+    return None
+
+  requested = {name.strip() for name in fields.split(",") if name.strip()}
+  unknown = requested - set(schemas.VEHICLE_FIELDS)
+  if unknown:
+    raise HTTPException(
+      status_code=422,
+      detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+    )
+  requested.add("vin")
+  return tuple(name for name in schemas.VEHICLE_FIELDS if name in requested)
+
+
+def _arrow_stream(db: Session, columns: tuple[str, ...]):
+  # get_db's cleanup runs after the streamed response is fully sent
+  # (fastapi>=0.118), so the request's own session stays open for it
+  batches = crud.iter_vehicle_batches(db, columns, formats.ARROW_BATCH_SIZE)
+  yield from formats.iter_arrow_stream(batches, columns)
+
 # GET /vehicle (all vehicles) -> 200 OK
-@router.get("", response_model=list[schemas.VehicleRead],
+# JSON by default, msgpack / Arrow stream when asked for in Accept
+@router.get("", response_model=list[schemas.VehicleRead] | list[schemas.VehiclePartial],
       status_code=status.HTTP_200_OK)
-def get_all_vehicles(db: Session = Depends(get_db)):
-  return crud.get_all_vehicles(db)
+def get_all_vehicles(fields: str | None = None, accept: str | None = Header(None),
+                     db: Session = Depends(get_db)):
+  columns = parse_fields(fields)
+  media_type = formats.negotiate(accept)
+
+  if media_type == formats.ARROW:
+    return StreamingResponse(_arrow_stream(db, columns or schemas.VEHICLE_FIELDS),
+                             media_type=formats.ARROW)
+
+  if media_type == formats.MSGPACK:
+    packed_columns = columns or schemas.VEHICLE_FIELDS
+    body = reads.do(
+      ("get_all_vehicles", packed_columns, formats.MSGPACK),
+      lambda: formats.to_msgpack(crud.get_all_vehicles(db, packed_columns), packed_columns),
+    )
+    return Response(content=body, media_type=formats.MSGPACK)
+
+  def read():
+    if columns:
+      rows = [dict(zip(columns, row)) for row in crud.get_all_vehicles(db, columns)]
+      partial = _partial_list_json.validate_python(rows)
+      return _partial_list_json.dump_json(partial, exclude_unset=True)
+
+    rows = _vehicle_list_json.validate_python(crud.get_all_vehicles(db), from_attributes=True)
+    return _vehicle_list_json.dump_json(rows)
+
+  body = reads.do(("get_all_vehicles", columns), read)
+  return Response(content=body, media_type="application/json")
 
 # GET /vehicle (single vehicle) -> 200 OK
 @router.get("/{vin}",response_model=schemas.VehicleRead,
     status_code=status.HTTP_200_OK,
 )
 def get_vehicle(vin: str, db: Session = Depends(get_db)):
-    vehicle = crud.get_vehicle(db, vin)
-    if vehicle is None:
+    def read():
+      vehicle = crud.get_vehicle(db, vin)
+      if vehicle is None:
+        return None
+      return _vehicle_json.dump_json(_vehicle_json.validate_python(vehicle, from_attributes=True))
+
+    body = reads.do(("get_vehicle", vin.lower()), read)
+    if body is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
-    return vehicle
+    return Response(content=body, media_type="application/json")
 
 # POST /vehicle -> 201 Created
 @router.post("", response_model=schemas.VehicleRead,
@@ -33,6 +101,7 @@ def get_vehicle(vin: str, db: Session = Depends(get_db)):
 def create_vehicle(vehicle_data: schemas.VehicleCreate, db: Session = Depends(get_db)):
   try:
     new_vehicle = crud.add_vehicle(db, vehicle_data)
+    forget_vehicle(new_vehicle.vin)
     return new_vehicle
   except IntegrityError:
     db.rollback()
@@ -41,6 +110,14 @@ def create_vehicle(vehicle_data: schemas.VehicleCreate, db: Session = Depends(ge
       detail=f"Vehicle with VIN {vehicle_data.vin} already exists"
     )
 
+# POST /vehicle/lookup (many vehicles) -> 200 OK
+@router.post("/lookup", response_model=schemas.VehicleLookupResult,
+    status_code=status.HTTP_200_OK,
+)
+def lookup_vehicles(lookup: schemas.VehicleLookup, db: Session = Depends(get_db)):
+  vehicles, missing = crud.get_vehicles_by_vins(db, lookup.vins)
+  return {"vehicles": vehicles, "missing": missing}
+
 # PUT /vehicle/{:vin} (update) -> 200 OK
 @router.put( "/{vin}", response_model=schemas.VehicleRead,
     status_code=status.HTTP_200_OK,
@@ -51,6 +128,7 @@ def update_vehicle(vin: str, vehicle_data: schemas.VehicleUpdate, db: Session =
       raise HTTPException(status_code=404, detail="Vehicle not found")
 
     updated = crud.update_vehicle(db, vin, vehicle_data)
+    forget_vehicle(vin)
     return updated
 
 # DELETE /vehicle/{:vin} -> 204 No Content
@@ -62,5 +140,6 @@ def delete_vehicle(vin: str, db: Session = Depends(get_db)):
     successful = crud.delete_vehicle(db, vin)
     if not successful:
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    forget_vehicle(vin)
 
     return None  # doesn't return anything
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, field_validator, field_serializer
+from pydantic import BaseModel, Field, create_model, field_validator, field_serializer
+from datetime import datetime
 from decimal import Decimal
 
 class VehicleBase(BaseModel):
@@ -13,11 +14,12 @@ class VehicleBase(BaseModel):
   fuel_type: str
 
   @field_serializer('purchase_price')
-  def serialize_price(self, value: Decimal) -> float:
+  def serialize_price(self, value: Decimal | None) -> float | None:
     """
     Serialize Decimal to float for JSON (standard for currency in REST APIs)
     """
-    return float(value)
+    # None only happens on VehiclePartial, where every field is optional
+    return float(value) if value is not None else None
 
 
 class VehicleCreate(VehicleBase):
@@ -31,6 +33,19 @@ class VehicleCreate(VehicleBase):
     return v.lower() if v else v
     
 
+class VehicleLookup(BaseModel):
+  """
+  POST /vehicle/lookup: resolve many VINs in one request
+  """
+  vins: list[str] = Field(..., min_length=1, max_length=1000)
+
+  @field_validator("vins")
+  @classmethod
+  def vins_validate(cls, v):
+    # same normalization as a single VIN on create
+    return [VehicleCreate.vin_validate(vin) for vin in v]
+
+
 class VehicleUpdate(VehicleBase):
     """
     PUT: requires a full vehicle object, all fields are required
@@ -47,3 +62,52 @@ class VehicleRead(VehicleBase):
   vin: str
 
   model_config = {"from_attributes": True}
+
+
+# columns a client may ask for with ?fields=, in table order
+VEHICLE_FIELDS = ("vin", *VehicleBase.model_fields)
+
+
+# GET /vehicle?fields=...: only the requested columns are loaded, so every
+# VehicleRead field is optional and unset ones are left out of the response
+VehiclePartial = create_model(
+  "VehiclePartial",
+  __base__=VehicleBase,
+  **{
+    name: (field.annotation | None, None)
+    for name, field in VehicleRead.model_fields.items()
+  },
+)
+
+
+class VehicleLookupResult(BaseModel):
+  vehicles: list[VehicleRead]
+  missing: list[str]
+
+
+############################
+#     BACKGROUND JOBS      #
+############################
+class VehicleBatch(BaseModel):
+  """
+  POST /jobs/import and /jobs/update: full vehicle objects, vin picks the
+  row to replace on update
+  """
+  vehicles: list[VehicleCreate] = Field(..., min_length=1)
+
+
+class JobRead(BaseModel):
+  id: str
+  kind: str
+  status: str
+  cancel_requested: bool
+  total: int | None
+  processed: int
+  failed: int
+  errors: list[dict]
+  error: str | None
+  has_result: bool
+  rows_per_second: float | None
+  created_at: datetime
+  started_at: datetime | None
+  finished_at: datetime | None
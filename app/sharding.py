@@ -0,0 +1,198 @@
+import argparse
+import heapq
+import zlib
+
+from sqlalchemy import String, create_engine, delete, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.functions import FunctionElement
+
+
+#############################
+#        SHARD ROUTING      #
+#############################
+def shard_index(vin: str, shard_count: int):
+  """
+  stable VIN -> shard position. crc32 of the lowercased VIN so the same
+  vehicle lands on the same shard in every process
+  """
+  return zlib.crc32(vin.lower().encode()) % shard_count
+
+
+class ShardMap:
+  """
+  Hash-partitions vehicles across several databases by VIN. Sessions made
+  by `sessionmaker` are ShardedSessions: inserts, refreshes and identity
+  lookups are routed by VIN, anything else runs on every shard.
+  """
+
+  def __init__(self, urls: list[str], make_engine=create_engine):
+    self.urls = list(urls)
+    self.shard_ids = [f"shard{i}" for i in range(len(self.urls))]
+    self.engines = {
+      shard_id: make_engine(url)
+      for shard_id, url in zip(self.shard_ids, self.urls)
+    }
+
+  def shard_for(self, vin: str):
+    return self.shard_ids[shard_index(vin, len(self.shard_ids))]
+
+  def _shard_chooser(self, mapper, instance, clause=None, **kw):
+    return self.shard_for(instance.vin)
+
+  def _identity_chooser(self, mapper, primary_key, **kw):
+    return [self.shard_for(primary_key[0])]
+
+  def _execute_chooser(self, orm_context):
+    # statements that weren't routed by crud (no shard_id) go everywhere
+    return self.shard_ids
+
+  def sessionmaker(self, **kwargs):
+    return sessionmaker(
+      class_=ShardedSession,
+      shards=self.engines,
+      shard_chooser=self._shard_chooser,
+      identity_chooser=self._identity_chooser,
+      execute_chooser=self._execute_chooser,
+      info={"shard_map": self},
+      **kwargs,
+    )
+
+  def dispose(self):
+    for engine in self.engines.values():
+      engine.dispose()
+
+
+def shard_map_of(db):
+  """
+  the ShardMap behind a session, or None for a plain single-database session
+  """
+  return db.info.get("shard_map")
+
+
+def route(db, vin: str):
+  """
+  bind_arguments sending a single-VIN statement to the shard owning it.
+  None (use the session's only bind) when sharding is off
+  """
+  shard_map = shard_map_of(db)
+  if shard_map is None:
+    return None
+  return {"shard_id": shard_map.shard_for(vin)}
+
+
+class binary_order(FunctionElement):
+  """
+  ORDER BY wrapper sorting a string column by codepoint, the same order
+  Python compares str in. a locale collation (postgres' en_US.utf8 puts
+  "bmw" before "Toyota") would disagree with merge_shards' key, and
+  heapq.merge only keeps order if every input is sorted by that same key
+  """
+  type = String()
+  inherit_cache = True
+
+
+@compiles(binary_order)
+def _binary_order_default(element, compiler, **kw):
+  # no known binary collation for this dialect, order by the column as is
+  return compiler.process(list(element.clauses)[0], **kw)
+
+
+@compiles(binary_order, "postgresql")
+def _binary_order_postgresql(element, compiler, **kw):
+  # "C" compares UTF-8 bytes, which is codepoint order
+  return f'{compiler.process(list(element.clauses)[0], **kw)} COLLATE "C"'
+
+
+@compiles(binary_order, "sqlite")
+def _binary_order_sqlite(element, compiler, **kw):
+  return f"{compiler.process(list(element.clauses)[0], **kw)} COLLATE BINARY"
+
+
+def merge_shards(results, key):
+  """
+  k-way merges per-shard results that are each already sorted by key. the
+  shards must order with binary_order so their order matches Python's
+  """
+  return heapq.merge(*results, key=key)
+
+
+#############################
+#         REBALANCING       #
+#############################
+def rebalance(table, old_urls: list[str], new_urls: list[str], batch_size: int = 1000):
+  """
+  moves rows so every VIN sits on the shard `new_urls` assigns it. rows are
+  copied to their new shard before being deleted from the old one, so an
+  interrupted run leaves duplicates (never lost rows) and can just be re-run
+
+  Args:
+      table (Table): vehicles table
+      old_urls (list[str]): shard URLs the data is currently laid out for
+      new_urls (list[str]): shard URLs to lay the data out for
+      batch_size (int): rows copied per transaction
+
+  Returns:
+      int: number of rows moved
+  """
+  sources = ShardMap(old_urls)
+  targets = ShardMap(new_urls)
+  target_engines = dict(zip(targets.urls, targets.engines.values()))
+  moved = 0
+
+  try:
+    for engine in targets.engines.values():
+      table.create(engine, checkfirst=True)
+
+    for source_url, source in zip(sources.urls, sources.engines.values()):
+      with source.connect() as conn:
+        vins = conn.execute(select(table.c.vin)).scalars().all()
+
+      # rows whose new shard is the database they're already in stay put
+      misplaced = [vin for vin in vins if targets.urls[shard_index(vin, len(new_urls))] != source_url]
+      for start in range(0, len(misplaced), batch_size):
+        chunk = misplaced[start:start + batch_size]
+        with source.connect() as conn:
+          rows = [row._asdict() for row in conn.execute(select(table).where(table.c.vin.in_(chunk)))]
+
+        by_target = {}
+        for row in rows:
+          by_target.setdefault(targets.urls[shard_index(row["vin"], len(new_urls))], []).append(row)
+
+        for target_url, target_rows in by_target.items():
+          with target_engines[target_url].begin() as conn:
+            # skip rows a previous interrupted run already copied
+            present = set(conn.execute(
+              select(table.c.vin).where(table.c.vin.in_([row["vin"] for row in target_rows]))
+            ).scalars())
+            missing = [row for row in target_rows if row["vin"] not in present]
+            if missing:
+              conn.execute(table.insert(), missing)
+
+        with source.begin() as conn:
+          conn.execute(delete(table).where(table.c.vin.in_(chunk)))
+        moved += len(rows)
+  finally:
+    sources.dispose()
+    targets.dispose()
+
+  return moved
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description="Move vehicles between shards after the shard list changes."
+  )
+  parser.add_argument("--old", nargs="+", required=True, help="current shard URLs, in order")
+  parser.add_argument("--new", nargs="+", required=True, help="new shard URLs, in order")
+  parser.add_argument("--batch-size", type=int, default=1000)
+  args = parser.parse_args(argv)
+
+  from app import models
+  moved = rebalance(models.Vehicle.__table__, args.old, args.new, args.batch_size)
+  print(f"moved {moved} vehicles")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for the crud hot path: lookup by VIN, list ordered by
+manufacturer and delete by VIN.
+
+Runs against an in-memory SQLite database so the numbers are dominated by
+Python-side statement construction/compilation, not I/O. Each case is
+timed twice: building a fresh ORM Query per call (how crud used to do it)
+and calling the crud function.
+
+    python benchmarks/bench_statements.py [iterations]
+"""
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CONN_URL"] = "sqlite://"
+
+from app import crud, models  # noqa: E402
+from app.database import Session, engine  # noqa: E402
+
+
+def timed(label, fn, iterations):
+  start = time.perf_counter()
+  for i in range(iterations):
+    fn(i)
+  per_call = (time.perf_counter() - start) / iterations * 1e6
+  print(f"{label:<40} {per_call:8.1f} us/call")
+
+
+def seed(db, count):
+  db.add_all([
+    models.Vehicle(
+      vin=f"bench{i:012d}",
+      manufacturer_name=f"Maker{i % 7}",
+      horse_power=100 + i,
+      model_name="Model",
+      model_year=2020,
+      purchase_price=Decimal("20000.00"),
+      fuel_type="Gasoline",
+    )
+    for i in range(count)
+  ])
+  db.commit()
+
+
+def main():
+  iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  models.Base.metadata.create_all(bind=engine)
+  db = Session()
+  seed(db, 50)
+  vins = [f"BENCH{i:012d}" for i in range(50)]
+
+  print(f"{iterations} iterations\n")
+
+  timed("get_vehicle: new Query per call",
+        lambda i: db.query(models.Vehicle)
+                    .filter(models.Vehicle.vin == vins[i % 50].lower())
+                    .first(),
+        iterations)
+  timed("get_vehicle: crud", lambda i: crud.get_vehicle(db, vins[i % 50]), iterations)
+
+  timed("get_all_vehicles: new Query per call",
+        lambda i: db.query(models.Vehicle)
+                    .order_by(models.Vehicle.manufacturer_name)
+                    .all(),
+        iterations // 10)
+  timed("get_all_vehicles: crud", lambda i: crud.get_all_vehicles(db), iterations // 10)
+
+  # delete misses keep the table intact so every iteration does the same work
+  timed("delete (miss): new Query per call",
+        lambda i: db.query(models.Vehicle)
+                    .filter(models.Vehicle.vin == "missing")
+                    .first(),
+        iterations)
+  timed("delete (miss): crud", lambda i: crud.delete_vehicle(db, "missing"), iterations)
+
+  db.close()
+
+
+if __name__ == "__main__":
+  main()
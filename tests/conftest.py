@@ -1,8 +1,11 @@
 import pytest
+from fastapi.testclient import TestClient
 from sqlalchemy import Column, String, Integer, Numeric, Text
 from sqlalchemy.orm import validates
+from unittest.mock import patch
 
-from app.database import Base, engine, Session
+from app.database import Base, engine, get_db, Session
+from app.main import app
 
 
 # model using vehicles_test table
@@ -42,3 +45,23 @@ def setup_test_table():
         db.commit()
     finally:
         db.close()
+
+
+def override_get_db():
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="function")
+def client():
+    # Patch models.Vehicle to use VehicleTest for tests
+    # setup_test_table runs automatically via autouse=True
+    with patch('app.models.Vehicle', VehicleTest):
+        with patch('app.crud.models.Vehicle', VehicleTest):
+            app.dependency_overrides[get_db] = override_get_db
+            with TestClient(app) as test_client:
+                yield test_client
+            app.dependency_overrides.clear()
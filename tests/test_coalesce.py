@@ -0,0 +1,100 @@
+import threading
+import time
+import pytest
+
+from app.coalesce import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(window_ms=2000)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def read():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return b"result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(("k",), read)))
+    leader.start()
+    started.wait(2)
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do(("k",), read)))
+        for _ in range(5)
+    ]
+    for t in followers:
+        t.start()
+    # let followers reach the wait before the leader finishes
+    time.sleep(0.1)
+    release.set()
+    for t in [leader, *followers]:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [b"result"] * 6
+    stats = flight.stats()
+    assert stats["executed"] == 1
+    assert stats["coalesced"] == 5
+    assert stats["in_flight"] == 0
+
+
+def test_result_not_reused_after_finish():
+    flight = SingleFlight(window_ms=2000)
+    counter = iter(range(10))
+    assert flight.do(("k",), lambda: next(counter)) == 0
+    assert flight.do(("k",), lambda: next(counter)) == 1
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_errors_and_disabled_window():
+    flight = SingleFlight(window_ms=2000)
+
+    def boom():
+        raise ValueError("db down")
+
+    with pytest.raises(ValueError):
+        flight.do(("k",), boom)
+    assert flight.stats()["in_flight"] == 0
+
+    # window 0 runs every call directly
+    disabled = SingleFlight(window_ms=0)
+    assert disabled.do(("k",), lambda: 42) == 42
+    assert disabled.stats()["executed"] == 0
+
+
+def test_forget_detaches_in_flight_call():
+    flight = SingleFlight(window_ms=2000)
+    started = threading.Event()
+    release = threading.Event()
+
+    def stale():
+        started.set()
+        release.wait(2)
+        return "old"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(("k",), stale)))
+    leader.start()
+    started.wait(2)
+
+    # after a write, new callers must not join the query that started before it
+    flight.forget(lambda key: key == ("k",))
+    assert flight.do(("k",), lambda: "new") == "new"
+
+    release.set()
+    leader.join()
+    assert results == ["old"]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_pause_bypasses_coalescing():
+    flight = SingleFlight(window_ms=2000)
+    flight.pause()
+    assert flight.do(("k",), lambda: 1) == 1
+    assert flight.stats()["executed"] == 0
+    flight.resume()
+    assert flight.do(("k",), lambda: 2) == 2
+    assert flight.stats()["executed"] == 1
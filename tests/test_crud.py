@@ -156,3 +156,38 @@ def test_delete(db_session, vehicle_create):
         created = crud.add_vehicle(db_session, vehicle_create)
         assert crud.delete_vehicle(db_session, created.vin.upper()) is True
         assert crud.get_vehicle(db_session, created.vin) is None
+
+
+# get_vehicles_by_vins tests
+def test_get_by_vins(db_session, vehicle_create):
+    with patch('app.crud.models.Vehicle', VehicleTest):
+        vins = ["BATCH000000000001", "BATCH000000000002", "BATCH000000000003"]
+        for vin in vins:
+            vehicle_create.vin = vin
+            crud.add_vehicle(db_session, vehicle_create)
+
+        # found + missing, request order kept, duplicates dropped
+        requested = ["batch000000000003", "missing00000001", "batch000000000001",
+                     "batch000000000003"]
+        vehicles, missing = crud.get_vehicles_by_vins(db_session, requested)
+        assert [v.vin for v in vehicles] == ["batch000000000003", "batch000000000001"]
+        assert missing == ["missing00000001"]
+
+        # spans several IN chunks
+        lowered = [vin.lower() for vin in vins]
+        vehicles, missing = crud.get_vehicles_by_vins(db_session, lowered, chunk_size=2)
+        assert [v.vin for v in vehicles] == lowered
+        assert missing == []
+
+
+# get_all_vehicles field projection tests
+def test_get_all_fields(db_session, vehicle_create):
+    with patch('app.crud.models.Vehicle', VehicleTest):
+        crud.add_vehicle(db_session, vehicle_create)
+
+        rows = crud.get_all_vehicles(db_session, ("vin", "model_name"))
+        assert len(rows) == 1
+        assert dict(rows[0]._mapping) == {
+            "vin": vehicle_create.vin.lower(),
+            "model_name": vehicle_create.model_name,
+        }
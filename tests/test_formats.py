@@ -0,0 +1,48 @@
+import io
+from decimal import Decimal
+
+import msgpack
+import pyarrow as pa
+
+from app import formats
+
+
+def test_negotiate():
+    assert formats.negotiate(None) == formats.JSON
+    assert formats.negotiate("*/*") == formats.JSON
+    assert formats.negotiate("text/csv") == formats.JSON
+    assert formats.negotiate("application/msgpack") == formats.MSGPACK
+    assert formats.negotiate(
+        "application/json;q=0.5, application/vnd.apache.arrow.stream"
+    ) == formats.ARROW
+    assert formats.negotiate("application/msgpack;q=0") == formats.JSON
+
+
+def test_to_msgpack_keeps_decimal():
+    body = formats.to_msgpack([("vin12345", Decimal("19999.99"))], ("vin", "purchase_price"))
+    assert msgpack.unpackb(body) == [{"vin": "vin12345", "purchase_price": "19999.99"}]
+
+
+def test_arrow_stream():
+    fields = ("vin", "model_year", "purchase_price")
+    batches = [
+        [("vin00001", 2020, Decimal("100.10")), ("vin00002", 2021, Decimal("200.20"))],
+        [("vin00003", 2022, Decimal("300.30"))],
+    ]
+    body = b"".join(formats.iter_arrow_stream(iter(batches), fields))
+
+    reader = pa.ipc.open_stream(body)
+    assert reader.schema.field("purchase_price").type == pa.decimal128(12, 2)
+    table = reader.read_all()
+    assert table.num_rows == 3
+    assert table.column("purchase_price").to_pylist()[2] == Decimal("300.30")
+
+
+def test_write_msgpack_array():
+    out = io.BytesIO()
+    batches = [[("vin00001", Decimal("1.10"))], [("vin00002", Decimal("2.20"))]]
+    formats.write_msgpack_array(out, iter(batches), ("vin", "purchase_price"))
+    assert msgpack.unpackb(out.getvalue()) == [
+        {"vin": "vin00001", "purchase_price": "1.10"},
+        {"vin": "vin00002", "purchase_price": "2.20"},
+    ]
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+import pytest
+import msgpack
+import pyarrow as pa
+from unittest.mock import patch
+from sqlalchemy.exc import DataError
+
+from app import crud
+from app.jobs import JobManager, run_job
+
+
+def make_vehicles(count, manufacturer="Toyota"):
+    return [
+        {
+            "vin": f"JOB{i:014d}",
+            "manufacturer_name": manufacturer,
+            "horse_power": 100 + i,
+            "model_name": f"Model{i}",
+            "model_year": 2020,
+            "purchase_price": "19999.99",
+            "fuel_type": "Gasoline"
+        }
+        for i in range(count)
+    ]
+
+
+def wait_for(client, job_id):
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+# POST /jobs/import tests
+def test_import(client):
+    client.post("/vehicle", json=make_vehicles(1)[0])
+
+    response = client.post("/jobs/import", json={"vehicles": make_vehicles(5)})
+    assert response.status_code == 202
+    assert response.json()["total"] == 5
+
+    job = wait_for(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["processed"] == 5
+    # the one created up front is reported, the rest still go in
+    assert job["failed"] == 1
+    assert job["errors"] == [{"vin": "job00000000000000", "error": "Vehicle already exists"}]
+    assert len(client.get("/vehicle").json()) == 5
+
+    # invalid payload
+    assert client.post("/jobs/import", json={"vehicles": []}).status_code == 422
+
+
+# POST /jobs/update tests
+def test_update(client):
+    wait_for(client, client.post("/jobs/import", json={"vehicles": make_vehicles(3)}).json()["id"])
+    updates = make_vehicles(4, manufacturer="Honda")
+
+    response = client.post("/jobs/update", json={"vehicles": updates})
+    job = wait_for(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["failed"] == 1
+    assert job["errors"][0]["error"] == "Vehicle not found"
+    assert {v["manufacturer_name"] for v in client.get("/vehicle").json()} == {"Honda"}
+
+
+# rows rejected for reasons other than a duplicate VIN
+def test_import_and_update_report_data_errors(client):
+    bad_vin = "job00000000000001"
+
+    def rejecting(real):
+        def call(db, vehicles):
+            if any(v.vin.lower() == bad_vin for v in vehicles):
+                raise DataError("INSERT", {}, Exception("value too long for type character varying(50)"))
+            return real(db, vehicles)
+        return call
+
+    with patch('app.jobs.crud.add_vehicles', rejecting(crud.add_vehicles)):
+        job = wait_for(client, client.post("/jobs/import", json={"vehicles": make_vehicles(3)}).json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["failed"] == 1
+    assert job["errors"] == [{"vin": bad_vin, "error": "value too long for type character varying(50)"}]
+    assert len(client.get("/vehicle").json()) == 2
+
+    with patch('app.jobs.crud.update_vehicles', rejecting(crud.update_vehicles)):
+        updates = make_vehicles(3, manufacturer="Honda")
+        job = wait_for(client, client.post("/jobs/update", json={"vehicles": updates}).json()["id"])
+    assert job["status"] == "succeeded"
+    # the row that failed to import is now both rejected and missing
+    assert [error["vin"] for error in job["errors"]] == [bad_vin]
+    assert {v["manufacturer_name"] for v in client.get("/vehicle").json()} == {"Honda"}
+
+
+# POST /jobs/export + GET /jobs/{id}/result tests
+def test_export(client):
+    job_id = client.post("/jobs/import", json={"vehicles": make_vehicles(3)}).json()["id"]
+    wait_for(client, job_id)
+
+    response = client.post("/jobs/export?fields=purchase_price")
+    assert response.status_code == 202
+    job = wait_for(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["processed"] == 3
+    assert job["has_result"] is True
+
+    result = client.get(f"/jobs/{job['id']}/result")
+    assert result.status_code == 200
+    table = pa.ipc.open_stream(result.content).read_all()
+    assert table.column_names == ["vin", "purchase_price"]
+    assert table.num_rows == 3
+
+    # msgpack export
+    job = wait_for(client, client.post("/jobs/export?format=msgpack").json()["id"])
+    result = client.get(f"/jobs/{job['id']}/result")
+    assert result.headers["content-type"] == "application/msgpack"
+    records = msgpack.unpackb(result.content)
+    assert len(records) == 3
+    assert records[0]["purchase_price"] == "19999.99"
+
+    # unknown job
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.get("/jobs/nope/result").status_code == 404
+    assert client.delete("/jobs/nope").status_code == 404
+
+
+# a cancel arriving once the export file is written doesn't discard it
+def test_export_cancel_after_write(client, tmp_path):
+    class CancelOnResult(dict):
+        def __setitem__(self, key, value):
+            super().__setitem__(key, value)
+            if key == "result_path":
+                super().__setitem__("cancel_requested", True)
+
+    progress = CancelOnResult(JobManager(executor="thread")._new_progress(None))
+    with patch('app.jobs.JOB_EXPORT_DIR', str(tmp_path)):
+        run_job("late", "export", (("vin",), "application/msgpack"), progress)
+    assert progress["status"] == "succeeded"
+    assert os.path.exists(progress["result_path"])
+
+
+# export files are removed with their job
+def test_export_files_cleaned_up(client, tmp_path):
+    manager = JobManager(executor="thread", workers=1)
+
+    def export():
+        job_id = manager.submit("export", (("vin",), "application/msgpack"))
+        for _ in range(200):
+            if manager.get(job_id)["finished_at"]:
+                break
+            time.sleep(0.01)
+        return manager.result(job_id)[0]
+
+    with patch('app.jobs.JOB_EXPORT_DIR', str(tmp_path)):
+        try:
+            first = export()
+            # forgotten once history is over the limit
+            with patch('app.jobs.JOB_HISTORY_LIMIT', 0):
+                second = export()
+            assert not os.path.exists(first)
+            assert os.path.exists(second)
+        finally:
+            manager.shutdown()
+    # and on shutdown
+    assert not os.path.exists(second)
+
+
+# JobManager queue limit + cancellation
+def test_manager_limits_and_cancel():
+    release = threading.Event()
+
+    def blocking(job_id, payload, progress):
+        # stands in for a long batch loop that checks for cancellation
+        while not progress["cancel_requested"]:
+            if release.wait(0.01):
+                return True
+        return False
+
+    with patch.dict('app.jobs._RUNNERS', {"block": blocking}):
+        manager = JobManager(executor="thread", workers=1, queue_limit=2)
+        try:
+            running = manager.submit("block", None)
+            queued = manager.submit("block", None)
+            # queue limit reached
+            assert manager.submit("block", None) is None
+
+            # a queued job never starts
+            assert manager.cancel(queued)["status"] == "cancelled"
+            # a running job stops at its next check
+            assert manager.cancel(running)["cancel_requested"] is True
+            for _ in range(200):
+                if manager.get(running)["status"] == "cancelled":
+                    break
+                time.sleep(0.01)
+            assert manager.get(running)["status"] == "cancelled"
+
+            # room again once jobs finish
+            finished = manager.submit("block", None)
+            release.set()
+            assert finished is not None
+        finally:
+            manager.shutdown()
+
+    with pytest.raises(ValueError):
+        JobManager(executor="fiber")
@@ -0,0 +1,146 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import crud, models, schemas
+from app.sharding import ShardMap, binary_order, rebalance
+
+
+def make_vehicle(i):
+    return schemas.VehicleCreate(
+        vin=f"SHARD{i:012d}",
+        manufacturer_name=f"Maker{i % 4}",
+        horse_power=100 + i,
+        model_name=f"Model{i}",
+        model_year=2020,
+        purchase_price=Decimal("20000.00"),
+        fuel_type="Gasoline"
+    )
+
+
+def count_rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.Vehicle.__table__)).scalar()
+
+
+def shard_urls(tmp_path, count):
+    return [f"sqlite:///{tmp_path}/shard{i}.db" for i in range(count)]
+
+
+@pytest.fixture
+def shard_map(tmp_path):
+    shards = ShardMap(shard_urls(tmp_path, 3))
+    for engine in shards.engines.values():
+        models.Base.metadata.create_all(bind=engine, tables=[models.Vehicle.__table__])
+    yield shards
+    shards.dispose()
+
+
+@pytest.fixture
+def sharded_db(shard_map):
+    db = shard_map.sessionmaker(autoflush=False)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# single-row crud routed by VIN hash
+def test_routing(shard_map, sharded_db):
+    for i in range(20):
+        crud.add_vehicle(sharded_db, make_vehicle(i))
+
+    # every row lives only on the shard its VIN hashes to
+    expected = {shard_id: 0 for shard_id in shard_map.shard_ids}
+    for i in range(20):
+        expected[shard_map.shard_for(f"shard{i:012d}")] += 1
+    assert {sid: count_rows(e) for sid, e in shard_map.engines.items()} == expected
+    assert sum(1 for n in expected.values() if n) > 1
+
+    vehicle = crud.get_vehicle(sharded_db, "SHARD000000000005")
+    assert vehicle.model_name == "Model5"
+
+    update = schemas.VehicleUpdate(**make_vehicle(5).model_dump(exclude={"vin"}))
+    update.model_name = "Updated"
+    assert crud.update_vehicle(sharded_db, "shard000000000005", update).model_name == "Updated"
+
+    assert crud.delete_vehicle(sharded_db, "shard000000000005") is True
+    assert crud.get_vehicle(sharded_db, "shard000000000005") is None
+    assert crud.delete_vehicle(sharded_db, "shard000000000005") is False
+
+
+# scatter-gather reads
+def test_scatter_gather(sharded_db):
+    for i in range(20):
+        crud.add_vehicle(sharded_db, make_vehicle(i))
+
+    vehicles = crud.get_all_vehicles(sharded_db)
+    assert len(vehicles) == 20
+    names = [v.manufacturer_name for v in vehicles]
+    assert names == sorted(names)
+
+    rows = crud.get_all_vehicles(sharded_db, ("vin", "model_year"))
+    assert len(rows) == 20
+    assert all(len(row) == 2 for row in rows)
+
+    batches = list(crud.iter_vehicle_batches(sharded_db, ("vin", "manufacturer_name"), 6))
+    assert [len(b) for b in batches] == [6, 6, 6, 2]
+    merged = [row[1] for batch in batches for row in batch]
+    assert merged == sorted(merged)
+
+    found, missing = crud.get_vehicles_by_vins(
+        sharded_db, ["shard000000000001", "shard000000000002", "nope00000"]
+    )
+    assert [v.vin for v in found] == ["shard000000000001", "shard000000000002"]
+    assert missing == ["nope00000"]
+
+
+# rebalancing onto a new shard list
+def test_rebalance(tmp_path, shard_map, sharded_db):
+    for i in range(30):
+        crud.add_vehicle(sharded_db, make_vehicle(i))
+    sharded_db.close()
+
+    # grow 3 -> 4 shards (the first three URLs are reused)
+    new_urls = shard_urls(tmp_path, 4)
+    moved = rebalance(models.Vehicle.__table__, shard_map.urls, new_urls, batch_size=4)
+    assert moved > 0
+
+    grown = ShardMap(new_urls)
+    try:
+        db = grown.sessionmaker()()
+        assert len(crud.get_all_vehicles(db)) == 30
+        for i in range(30):
+            assert crud.get_vehicle(db, f"SHARD{i:012d}") is not None
+        db.close()
+
+        # already balanced, nothing left to move
+        assert rebalance(models.Vehicle.__table__, new_urls, new_urls) == 0
+    finally:
+        grown.dispose()
+
+
+# shards and the merge must agree on order, also for mixed case names
+def test_merge_order_mixed_case(sharded_db):
+    names = ["bmw", "Toyota", "Audi", "audi", "Škoda", "BMW", "toyota", "Zeta"]
+    for i, name in enumerate(names * 3):
+        vehicle = make_vehicle(i)
+        vehicle.manufacturer_name = name
+        crud.add_vehicle(sharded_db, vehicle)
+
+    expected = sorted(names * 3)
+    assert [v.manufacturer_name for v in crud.get_all_vehicles(sharded_db)] == expected
+    rows = crud.get_all_vehicles(sharded_db, ("vin", "manufacturer_name"))
+    assert [row[1] for row in rows] == expected
+    batches = crud.iter_vehicle_batches(sharded_db, ("manufacturer_name",), 5)
+    assert [row[0] for batch in batches for row in batch] == expected
+
+
+def test_binary_order_compiles_per_dialect():
+    statement = select(models.Vehicle.vin).order_by(binary_order(models.Vehicle.manufacturer_name))
+    # postgres' default locale collation would disagree with Python's str order
+    assert 'COLLATE "C"' in str(statement.compile(dialect=postgresql.dialect()))
+    assert "COLLATE BINARY" in str(statement.compile(dialect=sqlite.dialect()))
+    # anything else gets the plain column rather than invalid SQL
+    assert "COLLATE" not in str(statement.compile(dialect=mysql.dialect()))
@@ -1,30 +1,10 @@
+import threading
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch
+import msgpack
+import pyarrow as pa
+from decimal import Decimal
 
-from app.main import app
-from app.database import get_db, Session
-from tests.conftest import VehicleTest
-
-
-def override_get_db():
-    db = Session()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture(scope="function")
-def client():
-    # Patch models.Vehicle to use VehicleTest for tests
-    # setup_test_table runs automatically via autouse=True
-    with patch('app.models.Vehicle', VehicleTest):
-        with patch('app.crud.models.Vehicle', VehicleTest):
-            app.dependency_overrides[get_db] = override_get_db
-            with TestClient(app) as test_client:
-                yield test_client
-            app.dependency_overrides.clear()
+from app.coalesce import reads
 
 
 @pytest.fixture
@@ -159,3 +139,103 @@ def test_delete(client, vehicle_data):
     response = client.delete(f"/vehicle/{vin}")
     assert response.status_code == 204
     assert response.content == b""
+
+
+# POST /vehicle/lookup tests
+def test_lookup(client, vehicle_data):
+    client.post("/vehicle", json=vehicle_data)
+    vin = vehicle_data["vin"].lower()
+
+    # found + missing, VINs normalized to lowercase
+    response = client.post("/vehicle/lookup",
+                           json={"vins": [vehicle_data["vin"].upper(), "NONEXISTENT"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [v["vin"] for v in body["vehicles"]] == [vin]
+    assert body["missing"] == ["nonexistent"]
+
+    # empty list
+    response = client.post("/vehicle/lookup", json={"vins": []})
+    assert response.status_code == 422
+
+
+# GET /stats/coalescing tests
+def test_coalescing_stats(client, vehicle_data):
+    client.post("/vehicle", json=vehicle_data)
+    before = client.get("/stats/coalescing").json()["executed"]
+    client.get("/vehicle")
+    client.get(f"/vehicle/{vehicle_data['vin']}")
+
+    response = client.get("/stats/coalescing")
+    assert response.status_code == 200
+    assert response.json()["executed"] == before + 2
+    assert response.json()["in_flight"] == 0
+
+
+# GET /vehicle?fields= tests
+def test_get_all_fields(client, vehicle_data):
+    client.post("/vehicle", json=vehicle_data)
+
+    # only requested columns, vin always included
+    response = client.get("/vehicle?fields=manufacturer_name,model_year,purchase_price")
+    assert response.status_code == 200
+    assert response.json() == [{
+        "vin": vehicle_data["vin"].lower(),
+        "manufacturer_name": "Toyota",
+        "model_year": 2023,
+        "purchase_price": 25000.0,
+    }]
+
+    # unknown field
+    response = client.get("/vehicle?fields=vin,color")
+    assert response.status_code == 422
+
+
+# GET /vehicle binary formats tests
+def test_get_all_binary(client, vehicle_data):
+    vehicle_data["purchase_price"] = "25000.99"
+    client.post("/vehicle", json=vehicle_data)
+
+    # msgpack, price kept exact
+    response = client.get("/vehicle", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    records = msgpack.unpackb(response.content)
+    assert records[0]["purchase_price"] == "25000.99"
+
+    # arrow stream, with projection
+    response = client.get("/vehicle?fields=purchase_price",
+                          headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["vin", "purchase_price"]
+    assert table.column("purchase_price").to_pylist() == [Decimal("25000.99")]
+
+
+# writes detach in-flight reads
+def test_write_detaches_in_flight_read(client, vehicle_data):
+    client.post("/vehicle", json=vehicle_data)
+    vin = vehicle_data["vin"].lower()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_stale_read():
+        # a GET that started before the PUT below committed
+        started.set()
+        release.wait(2)
+        return b'{"stale": true}'
+
+    leader = threading.Thread(target=lambda: reads.do(("get_vehicle", vin), slow_stale_read))
+    leader.start()
+    started.wait(2)
+    try:
+        update_data = vehicle_data.copy()
+        update_data.pop("vin")
+        update_data["manufacturer_name"] = "Honda"
+        assert client.put(f"/vehicle/{vin}", json=update_data).status_code == 200
+
+        response = client.get(f"/vehicle/{vin}")
+        assert response.json()["manufacturer_name"] == "Honda"
+    finally:
+        release.set()
+        leader.join()